@@ -1,10 +1,23 @@
 import uvicorn
 
 from research_portal.app import ui, server
-from research_portal.app.utils.config import REPORTS_BASE_DIR
+from research_portal.app.utils import report_scanner, thumbnails
+from research_portal.app.utils.config import LOG_LEVEL, REPORTS_BASE_DIR, WORKERS
 from research_portal.app.utils.thumbnails import PLAYWRIGHT_AVAILABLE
 
 
+def create_app(reports=None):
+    """Builds the Gradio interface and the FastAPI app that serves it."""
+    if reports is None:
+        reports = report_scanner.get_reports(str(REPORTS_BASE_DIR))
+
+    # 1. Create the Gradio interface
+    gradio_interface = ui.create_gradio_interface(reports)
+
+    # 2. Create the FastAPI app and mount the Gradio interface
+    return server.create_fastapi_app(gradio_interface, reports)
+
+
 def main():
     """Main function to set up and run the application."""
     print("🚀 Launching Smart Report Portal...")
@@ -19,22 +32,28 @@ def main():
     if not REPORTS_BASE_DIR.is_dir():
         print(f"❌ Directory not found. Please create it or set the SMART_REPORTS_DIR_PATH environment variable.")
 
-    # 1. Create the Gradio interface
-    gradio_interface = ui.create_gradio_interface()
+    # Render missing thumbnails once, so every worker starts from a warm disk cache
+    reports = report_scanner.get_reports(str(REPORTS_BASE_DIR))
+    if PLAYWRIGHT_AVAILABLE:
+        print(f"Generating thumbnails for {len(reports)} report(s)...")
+    thumbnails.prewarm_thumbnails([report['path'] for report in reports])
 
-    # 2. Create the FastAPI app and mount the Gradio interface
-    app = server.create_fastapi_app(gradio_interface)
+    # Launch with Uvicorn. A single worker reuses the scan above; multiple workers
+    # build the app through the factory so that every process creates its own
+    # instance. uvloop and httptools are picked up automatically when installed.
+    app = create_app(reports) if WORKERS == 1 else "research_portal.app.app:create_app"
 
-    # 3. Launch with Uvicorn
     print("\n" + "=" * 50)
     print(f"🔗 Portal available at: http://127.0.0.1:7860")
     print("=" * 50 + "\n")
 
     uvicorn.run(
         app,
+        factory=WORKERS > 1,
         host="0.0.0.0",
         port=7860,
-        log_level="info"
+        workers=WORKERS,
+        log_level=LOG_LEVEL
     )
 
 
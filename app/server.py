@@ -1,63 +1,127 @@
-import json
+import mimetypes
+from contextlib import asynccontextmanager
 
 import gradio as gr
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.staticfiles import StaticFiles
 
-from research_portal.app.utils.config import REPORTS_BASE_DIR
+from research_portal.app.utils import report_scanner, thumbnails
+from research_portal.app.utils.config import REPORTS_BASE_DIR, STATIC_DIR, STATIC_URL_PATH
 
 
-def create_fastapi_app(gradio_demo: gr.Blocks):
+# Browsers may reuse a report for an hour, then revalidate it in the background
+REPORT_CACHE_CONTROL = "public, max-age=3600, stale-while-revalidate=86400"
+
+# Versioned portal assets (?v=<content hash>) never change behind their URL
+VERSIONED_ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Content types of the cached thumbnail formats
+THUMBNAIL_MEDIA_TYPES = {".webp": "image/webp", ".jpg": "image/jpeg", ".svg": "image/svg+xml"}
+
+# Reference data files for reports are JSON; register the type so they aren't served as text/plain
+mimetypes.add_type("application/json", ".linkres")
+
+# Content types that are already compressed, so gzipping them only burns CPU. SVG
+# is text and is still compressed.
+PRECOMPRESSED_CONTENT_TYPE_PREFIXES = ("image/", "audio/", "video/")
+COMPRESSIBLE_IMAGE_TYPES = {"image/svg+xml"}
+
+# zlib level for text responses; above 6 the gains are marginal for a lot more CPU
+GZIP_COMPRESS_LEVEL = 6
+
+
+class MediaAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that passes images, audio and video through uncompressed. The
+    type is guessed from the URL path, as StaticFiles and the thumbnail route do.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            content_type, _ = mimetypes.guess_type(scope["path"])
+            if (content_type and content_type.startswith(PRECOMPRESSED_CONTENT_TYPE_PREFIXES)
+                    and content_type not in COMPRESSIBLE_IMAGE_TYPES):
+                await self.app(scope, receive, send)
+                return
+        await super().__call__(scope, receive, send)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Keeps a single thumbnail browser alive for the lifetime of the server."""
+    app.state.browser = await thumbnails.start_shared_browser()
+
+    # Load the thumbnails warmed up by main(), rendering any that are still missing
+    await thumbnails.generate_all_thumbnails([report['path'] for report in app.state.reports])
+
+    yield
+    await thumbnails.stop_shared_browser()
+
+
+def create_fastapi_app(gradio_demo: gr.Blocks, reports=None):
     """Creates the FastAPI app, defines static routes, and mounts the Gradio UI."""
-    fastapi_app = FastAPI(title="Smart Reports Gallery")
+    fastapi_app = FastAPI(title="Smart Reports Gallery", lifespan=lifespan)
+    if reports is None:
+        reports = report_scanner.get_reports(str(REPORTS_BASE_DIR))
+    fastapi_app.state.reports = reports
+
+    # Reports, the gallery and .linkres data are text and compress well; tiny responses
+    # aren't worth the overhead
+    fastapi_app.add_middleware(MediaAwareGZipMiddleware, minimum_size=1024, compresslevel=GZIP_COMPRESS_LEVEL)
+
+    @fastapi_app.middleware("http")
+    async def add_cache_headers(request: Request, call_next):
+        """Lets browsers cache reports and portal assets instead of re-fetching them on every open."""
+        response = await call_next(request)
+        if response.status_code in (200, 304):
+            path = request.url.path
+            if path.startswith(("/reports/", "/report-resource/")):
+                response.headers["Cache-Control"] = REPORT_CACHE_CONTROL
+            elif path.startswith(STATIC_URL_PATH + "/") and "v" in request.query_params:
+                response.headers["Cache-Control"] = VERSIONED_ASSET_CACHE_CONTROL
+        return response
 
     if REPORTS_BASE_DIR.is_dir():
         print(f"✅ Reports directory found. Setting up static routes for: {REPORTS_BASE_DIR}")
 
-        @fastapi_app.get("/reports/{file_path:path}")
-        async def serve_report_html(file_path: str):
-            """Serves the main HTML file for a report."""
-            try:
-                full_path = REPORTS_BASE_DIR / file_path
-                if not str(full_path.resolve()).startswith(str(REPORTS_BASE_DIR.resolve())):
-                    raise HTTPException(status_code=403, detail="Access denied")
-                if not full_path.exists() or not file_path.lower().endswith('.html'):
-                    raise HTTPException(status_code=404, detail="HTML Report not found")
-
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                return HTMLResponse(content=content)
-            except HTTPException:
-                raise
-            except Exception as e:
-                print(f"Error serving report {file_path}: {e}")
-                raise HTTPException(status_code=500, detail="Internal server error")
-
-        @fastapi_app.get("/report-resource/{resource_path:path}")
-        async def serve_report_resource(resource_path: str):
-            """Serves supplementary resources for reports (e.g., audio, data)."""
-            try:
-                full_resource_path = REPORTS_BASE_DIR / resource_path
-                if not str(full_resource_path.resolve()).startswith(str(REPORTS_BASE_DIR.resolve())):
-                    raise HTTPException(status_code=403, detail="Access denied")
-                if not full_resource_path.exists():
-                    raise HTTPException(status_code=404, detail="Resource not found")
-
-                # Special handling for different file types can go here if needed
-                if resource_path.endswith('.linkres'):
-                    with open(full_resource_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    return JSONResponse(content=data)
-
-                return FileResponse(full_resource_path)
-            except HTTPException:
-                raise
-            except Exception as e:
-                print(f"Error serving resource {resource_path}: {e}")
-                raise HTTPException(status_code=500, detail="Internal server error")
+        # StaticFiles streams files with sendfile, answers Range requests and 304s from
+        # ETag/Last-Modified, and rejects paths that escape the directory. Reports
+        # and their resources are mounted from the same tree, so relative links
+        # inside a report (audio, images) resolve under /reports/ as well.
+        reports_files = StaticFiles(directory=str(REPORTS_BASE_DIR))
+        fastapi_app.mount("/reports", reports_files, name="reports")
+        fastapi_app.mount("/report-resource", reports_files, name="report-resource")
     else:
         print(f"⚠️ Reports directory not found: {REPORTS_BASE_DIR}")
 
+    @fastapi_app.get("/thumb/{file_name}")
+    async def serve_thumbnail(file_name: str):
+        """Serves a cached report thumbnail: a WebP/JPEG screenshot or an SVG text preview."""
+        cache_path = thumbnails.find_cached_thumbnail(file_name)
+        if cache_path is None:
+            raise HTTPException(status_code=404, detail="Thumbnail not found")
+
+        # Keys change whenever the report does, so the bytes behind a URL never change
+        return FileResponse(
+            cache_path,
+            media_type=THUMBNAIL_MEDIA_TYPES[cache_path.suffix],
+            headers={"Cache-Control": "public, max-age=31536000, immutable"}
+        )
+
+    @fastapi_app.get("/thumb-for/{report_path:path}")
+    async def serve_thumbnail_on_demand(report_path: str):
+        """Renders a report's thumbnail if it is missing, then redirects to the cached file."""
+        # Concurrent requests from one page load are rendered together as one batch
+        thumbnail_file = await thumbnails.request_thumbnail(report_path)
+        if thumbnail_file is None:
+            raise HTTPException(status_code=404, detail="Thumbnail not found")
+        return RedirectResponse(f"/thumb/{thumbnail_file}")
+
+    # Serve the portal's own assets (e.g. the gallery stylesheet) so browsers can cache them
+    fastapi_app.mount(STATIC_URL_PATH, StaticFiles(directory=str(STATIC_DIR)), name="portal-static")
+
     # Mount the Gradio app as the root
     app = gr.mount_gradio_app(fastapi_app, gradio_demo, path="/")
     return app
@@ -1,58 +1,72 @@
+import functools
+import hashlib
 from urllib.parse import quote
 
 import gradio as gr
+from jinja2 import Environment
 
 from research_portal.app.utils import thumbnails, report_scanner, config
 
+# Content hash of the stylesheet, appended to its URL so browsers can cache it
+# indefinitely and still pick up every change
+CSS_VERSION = hashlib.sha1(config.CSS_PATH.read_bytes()).hexdigest()[:8]
 
-def create_thumbnail_html(report):
-    """Creates a thumbnail card for a single report."""
-    thumbnail_b64 = thumbnails.get_thumbnail_for_report(report['path'])
-    encoded_path = quote(report['path'])
-    static_url = f"/reports/{encoded_path}"
-
-    if thumbnail_b64:
-        thumbnail_content = f'<div class="thumbnail-image"><img src="data:image/png;base64,{thumbnail_b64}" alt="Preview" /></div>'
-    else:
-        thumbnail_content = '<div class="thumbnail-fallback"><div class="fallback-icon">📊</div><div class="fallback-text">HTML Report</div></div>'
-
-    return f'''
-    <div class="report-card">
-        <div class="card-thumbnail">{thumbnail_content}</div>
-        <div class="card-content">
-            <h3 class="report-title">{report['name']}</h3>
-            <a href="{static_url}" target="_blank" rel="noopener noreferrer" class="view-button">
-                View Report
-            </a>
-        </div>
-    </div>
-    '''
+# Compiled once; autoescaping keeps report names and paths from breaking the markup
+GALLERY_TEMPLATE = Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True).from_string(
+    config.GALLERY_TEMPLATE_PATH.read_text(encoding='utf-8')
+)
+
+
+@functools.lru_cache(maxsize=1)
+def render_gallery_cards(cards):
+    """Renders the gallery markup; memoized since page loads mostly see an unchanged gallery."""
+    return GALLERY_TEMPLATE.render(
+        cards=cards,
+        thumbnail_width=thumbnails.THUMBNAIL_WIDTH,
+        thumbnail_height=thumbnails.THUMBNAIL_HEIGHT,
+        reports_dir_name=config.REPORTS_BASE_DIR.name
+    )
 
 
 def create_report_gallery_html(reports):
     """Creates the complete HTML for the gallery of report thumbnails."""
-    if not reports:
-        return f'''
-        <div class="no-reports-container">
-            <div class="no-reports-icon">📂</div>
-            <h3>No Reports Found</h3>
-            <p>Place your HTML reports in the <code>{config.REPORTS_BASE_DIR.name}</code> directory.</p>
-        </div>
-        '''
+    # Everything the markup depends on, so a new report or thumbnail re-renders it
+    cards = tuple(
+        (report['name'], report['url'], get_thumbnail_url(report['path']))
+        for report in reports
+    )
+    return render_gallery_cards(cards)
 
-    print(f"Generating thumbnails for {len(reports)} report(s)...")
-    cards_html = "".join([create_thumbnail_html(report) for report in reports])
-    return f'<div class="reports-gallery">{cards_html}</div>'
 
+def get_thumbnail_url(report_path):
+    """
+    Returns the URL of a report's cached thumbnail. Reports without one point at
+    the on-demand endpoint instead, which the browser's lazy loading only requests
+    once the card scrolls into view.
+    """
+    thumbnail_file = thumbnails.get_thumbnail_for_report(report_path)
+    if thumbnail_file:
+        return f"/thumb/{thumbnail_file}"
+    return f"/thumb-for/{quote(report_path)}"
 
-def create_gradio_interface():
-    """Creates the main Gradio interface for the gallery."""
-    reports = report_scanner.find_reports(str(config.REPORTS_BASE_DIR))
 
-    with open(config.CSS_PATH, "r") as f:
-        css = f.read()
+def refresh_report_gallery():
+    """
+    Rescans the reports and rebuilds the gallery. Thumbnails of new or changed
+    reports are rendered on demand when their cards come into view, so the page
+    load doesn't wait for the browser.
+    """
+    reports = report_scanner.get_reports(str(config.REPORTS_BASE_DIR))
+    thumbnails.index_cached_thumbnails([report['path'] for report in reports])
+    return create_report_gallery_html(reports)
+
+
+def create_gradio_interface(reports=None):
+    """Creates the main Gradio interface for the gallery."""
+    if reports is None:
+        reports = report_scanner.get_reports(str(config.REPORTS_BASE_DIR))
 
-    with gr.Blocks(css=css, theme=gr.themes.Base()) as demo:
+    with gr.Blocks(theme=gr.themes.Base()) as demo:
         # Custom HTML for a cleaner header
         logo_svg = '''
         <svg width="43.5" height="34.5" viewBox="0 0 87 69" fill="none" xmlns="http://www.w3.org/2000/svg" class="logo">
@@ -66,14 +80,16 @@ def create_gradio_interface():
             {logo_svg}
             <h1>Smart Report Portal</h1>
         </div>
+        <link rel="stylesheet" href="{config.STATIC_URL_PATH}/{config.CSS_PATH.name}?v={CSS_VERSION}">
         <link rel="preconnect" href="https://fonts.googleapis.com">
         <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
         <link href="https://fonts.googleapis.com/css2?family=Montserrat:wght@400;600;700&display=swap" rel="stylesheet">
         '''
         gr.HTML(header_html)
 
-        # Display the gallery
+        # Display the gallery, refreshing it on every page load to pick up new reports
         gallery_html = create_report_gallery_html(reports)
-        gr.HTML(gallery_html)
+        gallery = gr.HTML(gallery_html)
+        demo.load(refresh_report_gallery, outputs=gallery, show_progress="hidden")
 
     return demo
@@ -8,5 +8,30 @@ DEFAULT_REPORTS_DIR = Path(__file__).parent.parent.parent.parent / "Smart Report
 # Determine the actual reports directory path
 REPORTS_BASE_DIR = Path(os.getenv(REPORTS_DIR_CONFIG_KEY, DEFAULT_REPORTS_DIR)).resolve()
 
+# Configuration for the on-disk thumbnail cache
+THUMBNAIL_CACHE_DIR_CONFIG_KEY = "THUMBNAIL_CACHE_DIR_PATH"
+DEFAULT_THUMBNAIL_CACHE_DIR = Path(__file__).parent.parent.parent / ".thumb_cache"
+THUMBNAIL_CACHE_DIR = Path(os.getenv(THUMBNAIL_CACHE_DIR_CONFIG_KEY, DEFAULT_THUMBNAIL_CACHE_DIR)).resolve()
+
+# Opt-in lean Chromium mode for thumbnails (single process, no sandbox). Only
+# suitable because Smart Reports are trusted local files.
+FAST_THUMBNAILS_CONFIG_KEY = "FAST_THUMBS"
+FAST_THUMBNAILS = os.getenv(FAST_THUMBNAILS_CONFIG_KEY, "0") == "1"
+
+# Number of Uvicorn worker processes serving the portal
+WORKERS_CONFIG_KEY = "PORTAL_WORKERS"
+WORKERS = int(os.getenv(WORKERS_CONFIG_KEY, "1"))
+
+# Uvicorn log level; "warning" drops the per-request access log lines
+LOG_LEVEL_CONFIG_KEY = "PORTAL_LOG_LEVEL"
+LOG_LEVEL = os.getenv(LOG_LEVEL_CONFIG_KEY, "info").lower()
+
+# Directory of static assets served by the portal, and the URL it is mounted at
+STATIC_DIR = Path(__file__).parent.parent.parent / "static"
+STATIC_URL_PATH = "/portal/static"
+
 # Path to the static CSS file
-CSS_PATH = Path(__file__).parent.parent.parent / "static" / "gallery.css"
+CSS_PATH = STATIC_DIR / "gallery.css"
+
+# Path to the gallery HTML template
+GALLERY_TEMPLATE_PATH = Path(__file__).parent.parent.parent / "templates" / "gallery.jinja"
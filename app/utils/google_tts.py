@@ -1,5 +1,5 @@
 # To run this code you need to install the following dependencies:
-# pip install google-genai beautifulsoup4
+# pip install google-genai
 
 """
 Generates individual audio files for a guided tour based on narration scripts
@@ -19,29 +19,108 @@ Usage:
 
   - Use a different TTS model:
     python google_tts.py --model "gemini-2.5-flash-preview-tts"
+
+  - Run up to 8 requests at once, starting at most one every 2 seconds:
+    python google_tts.py --workers 8 --delay 2
 """
 
 import argparse
 import ast
+import json
+import logging
 import os
 import re
+import struct
+import threading
 import time
-import wave
+from concurrent.futures import ThreadPoolExecutor
 
-from bs4 import BeautifulSoup
 from google import genai
 from google.genai import types
 
+logger = logging.getLogger(__name__)
+
+# Patterns used to pull the tour data array out of a report's HTML
+TOUR_DATA_PATTERN = re.compile(r'this\.tourData\s*=\s*(\[.*?\]);', re.DOTALL)
+JS_COMMENT_PATTERN = re.compile(r'//.*')
+JS_OBJECT_KEY_PATTERN = re.compile(r'([{\s,])([a-zA-Z0-9_]+)\s*:')
+
+# Tokens that differ between a JavaScript array literal and JSON. String literals
+# are matched first so that slashes, colons and commas inside narration text are
+# left alone; comments are stripped in a first pass so keys can be found after them.
+JS_STRING = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+JS_STRING_OR_COMMENT_PATTERN = re.compile(rf'({JS_STRING})|//[^\n]*')
+JS_TO_JSON_PATTERN = re.compile(
+    r'("(?:\\.|[^"\\])*")'                  # double-quoted string: already valid JSON
+    r"|('(?:\\.|[^'\\])*')"                 # single-quoted string
+    r'|([{,]\s*)([A-Za-z_$][\w$]*)\s*:'     # bare object key
+    r'|,(\s*[}\]])'                         # trailing comma
+)
+
+# Patterns used to detect the speakers of a narration script
+SPEAKER_PATTERN = re.compile(r'(Speaker\s*"?\d+"?|[A-Za-z]+):\s*')
+QUOTED_SPEAKER_NUMBER_PATTERN = re.compile(r'"(\d+)"')
+
+
+class RateLimiter:
+    """
+    Spaces out the start of API requests by a minimum interval, across threads.
+    Requests may still overlap; only their start times are rate limited.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_start = time.monotonic()
+
+    def wait(self):
+        """Blocks until the calling thread may start its request."""
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def wave_header(data_size, channels=1, rate=24000, sample_width=2):
+    """Builds the 44-byte RIFF/WAVE header for PCM data of a known size."""
+    return (
+        b'RIFF' + struct.pack('<I', 36 + data_size) + b'WAVE'
+        + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, rate,
+                                rate * channels * sample_width, channels * sample_width, sample_width * 8)
+        + b'data' + struct.pack('<I', data_size)
+    )
+
 
 def save_wave_file(file_name, pcm_data, channels=1, rate=24000, sample_width=2):
     """Saves PCM audio data to a WAV file, creating directories if needed."""
     os.makedirs(os.path.dirname(file_name), exist_ok=True)
-    with wave.open(file_name, "wb") as wf:
-        wf.setnchannels(channels)
-        wf.setsampwidth(sample_width)
-        wf.setframerate(rate)
-        wf.writeframes(pcm_data)
-    print(f"File saved to: {file_name}")
+    # The data size is known up front, so header and samples go out in one write
+    # instead of wave's write-then-seek-back-to-patch-sizes
+    with open(file_name, "wb") as f:
+        f.write(wave_header(len(pcm_data), channels, rate, sample_width) + pcm_data)
+    logger.info("File saved to: %s", file_name)
+
+
+def _js_array_to_json(js_array_string):
+    """Converts a JavaScript array literal to a JSON string."""
+    without_comments = JS_STRING_OR_COMMENT_PATTERN.sub(lambda match: match.group(1) or '', js_array_string)
+    return JS_TO_JSON_PATTERN.sub(_js_token_to_json, without_comments)
+
+
+def _js_token_to_json(match):
+    """Rewrites one JavaScript token matched by JS_TO_JSON_PATTERN as JSON."""
+    double_quoted, single_quoted, key_prefix, key, closing = match.groups()
+    if double_quoted:
+        return double_quoted
+    if single_quoted:
+        return json.dumps(ast.literal_eval(single_quoted))
+    if key:
+        return f'{key_prefix}"{key}":'
+    if closing:
+        return closing
+    return ''
 
 
 def get_tour_data_from_html(file_path):
@@ -50,30 +129,35 @@ def get_tour_data_from_html(file_path):
         with open(file_path, 'r', encoding='utf-8') as f:
             html_content = f.read()
     except FileNotFoundError:
-        print(f"Error: The file {file_path} was not found.")
+        logger.error("The file %s was not found.", file_path)
         return None
 
-    soup = BeautifulSoup(html_content, 'html.parser')
-    scripts = soup.find_all('script')
+    # Only the tourData literal is needed, so search the raw HTML for it instead of
+    # building a parse tree of the whole report
+    match = TOUR_DATA_PATTERN.search(html_content) if 'TourManager.init' in html_content else None
+    if not match:
+        logger.error("Could not find the 'TourManager.tourData' array in %s.", file_path)
+        return None
 
-    for script in scripts:
-        if script.string and 'TourManager.init' in script.string:
-            match = re.search(r'this\.tourData\s*=\s*(\[.*?\]);', script.string, re.DOTALL)
-            if match:
-                js_array_string = match.group(1)
-                js_array_string = re.sub(r'//.*', '', js_array_string)
-                py_literal_string = re.sub(r'([{\s,])([a-zA-Z0-9_]+)\s*:', r'\1"\2":', js_array_string)
+    js_array_string = match.group(1)
 
-                try:
-                    tour_data_object = ast.literal_eval(py_literal_string)
-                    return tour_data_object
-                except (ValueError, SyntaxError) as e:
-                    print(f"Error parsing the JavaScript object literal: {e}")
-                    print("Cleaned string that failed parsing:\n", py_literal_string)
-                    return None
+    # Tour data is an object literal that converts to JSON token by token,
+    # which the C json parser reads much faster than building an AST
+    try:
+        return json.loads(_js_array_to_json(js_array_string))
+    except (json.JSONDecodeError, ValueError, SyntaxError):
+        pass
 
-    print(f"Error: Could not find the 'TourManager.tourData' array in {file_path}.")
-    return None
+    # Fall back to the Python literal parser for anything the conversion missed
+    js_array_string = JS_COMMENT_PATTERN.sub('', js_array_string)
+    py_literal_string = JS_OBJECT_KEY_PATTERN.sub(r'\1"\2":', js_array_string)
+    try:
+        tour_data_object = ast.literal_eval(py_literal_string)
+        return tour_data_object
+    except (ValueError, SyntaxError) as e:
+        logger.error("Could not parse the JavaScript object literal: %s", e)
+        logger.debug("Cleaned string that failed parsing:\n%s", py_literal_string)
+        return None
 
 
 def create_speech_config(narration_text):
@@ -90,33 +174,32 @@ def create_speech_config(narration_text):
     }
 
     # Look for speaker patterns and preserve order of appearance
-    speaker_pattern = r'(Speaker\s*"?\d+"?|[A-Za-z]+):\s*'
     speakers_found = []
-    matches = re.findall(speaker_pattern, narration_text)
+    matches = SPEAKER_PATTERN.findall(narration_text)
 
     for match in matches:
         speaker_name = match.strip()
-        speaker_name = re.sub(r'"(\d+)"', r'\1', speaker_name)
+        speaker_name = QUOTED_SPEAKER_NUMBER_PATTERN.sub(r'\1', speaker_name)
         if speaker_name not in speakers_found:
             speakers_found.append(speaker_name)
 
-    print(f"  Detected speakers in order: {speakers_found}")
-
     # Filter to only supported speakers, maintaining order
     supported_speakers = [s for s in speakers_found if s in voice_mapping]
 
     if not supported_speakers:
-        print(f"  Error: No supported speakers found. Supported speakers: {list(voice_mapping.keys())}")
+        logger.error("No supported speakers found in %s. Supported speakers: %s",
+                     speakers_found, list(voice_mapping.keys()))
         return None, narration_text
 
-    print(f"  Processing speakers in order: {supported_speakers}")
+    # One aggregated line per stop instead of one print per speaker
+    logger.debug("speakers=%s voices=%s", speakers_found,
+                 [voice_mapping[speaker] for speaker in supported_speakers])
 
     if len(supported_speakers) > 1:
         # Multi-speaker configuration - create in consistent order
         speaker_configs = []
         for speaker in supported_speakers:
             voice_name = voice_mapping[speaker]
-            print(f"  Mapping '{speaker}' to voice '{voice_name}'")
             speaker_configs.append(
                 types.SpeakerVoiceConfig(
                     speaker=speaker,
@@ -137,7 +220,6 @@ def create_speech_config(narration_text):
         # Single speaker configuration
         speaker = supported_speakers[0]
         voice_name = voice_mapping[speaker]
-        print(f"  Single speaker: Mapping '{speaker}' to voice '{voice_name}'")
         speech_config = types.SpeechConfig(
             voice_config=types.VoiceConfig(
                 prebuilt_voice_config=types.PrebuiltVoiceConfig(
@@ -149,35 +231,38 @@ def create_speech_config(narration_text):
     return speech_config, narration_text
 
 
-def generate_audio_for_stop(client, stop, stop_index, output_dir, model_name):
+def generate_audio_for_stop(client, stop, stop_index, output_dir, model_name, rate_limiter=None):
     """Generates a single audio file for a given tour stop object."""
-    narration_style = stop.get('narrationStyle', '')
-    narration_text = stop.get('narration', '')
-
     output_file = os.path.join(output_dir, f"stop_{stop_index}.wav")
 
-    if not narration_text:
-        print(f"Skipping stop {stop_index} due to missing narration text.")
+    # Check for existing audio first, so re-runs cost one stat per stop
+    if os.path.exists(output_file):
+        logger.info("Audio file already exists, skipping: %s", output_file)
         return False
 
-    if os.path.exists(output_file):
-        print(f"Audio file already exists, skipping: {output_file}")
+    narration_style = stop.get('narrationStyle', '')
+    narration_text = stop.get('narration', '')
+
+    if not narration_text:
+        logger.warning("Skipping stop %d due to missing narration text.", stop_index)
         return False
 
-    print(f"Generating audio for: {output_file}")
-    print(f"  Style: {narration_style}")
-    print(f"  Narration text: {narration_text[:100]}...")
+    logger.info("Generating audio for: %s", output_file)
+    logger.debug("stop=%d style=%r narration=%r", stop_index, narration_style, narration_text[:100])
 
     # Create speech configuration
     speech_config, processed_text = create_speech_config(narration_text)
 
     if speech_config is None:
-        print(f"  Error: Could not create speech config for stop {stop_index}")
+        logger.error("Could not create speech config for stop %d", stop_index)
         return False
 
     # Combine style instruction with the text
     styled_text = f"{narration_style}\n\n{processed_text}" if narration_style else processed_text
 
+    if rate_limiter is not None:
+        rate_limiter.wait()
+
     try:
         response = client.models.generate_content(
             model=model_name,
@@ -197,11 +282,11 @@ def generate_audio_for_stop(client, stop, stop_index, output_dir, model_name):
             save_wave_file(output_file, audio_data)
             return True
         else:
-            print(f"Error: No audio data received for {output_file}")
+            logger.error("No audio data received for %s", output_file)
             return False
 
     except Exception as e:
-        print(f"An error occurred while generating audio for '{output_file}': {e}")
+        logger.error("Could not generate audio for '%s': %s", output_file, e)
         return False
 
 
@@ -225,16 +310,29 @@ def main():
     )
     parser.add_argument(
         '-d', '--delay',
-        type=int,
+        type=float,
         default=5,
-        help='Delay in seconds between API requests to avoid rate limiting. (Default: 5)'
+        help='Minimum delay in seconds between the starts of API requests, to avoid rate limiting. (Default: 5)'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=4,
+        help='Maximum number of API requests in flight at once. (Default: 4)'
+    )
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Log the detected speakers and voices for every stop.'
     )
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(levelname)s: %(message)s")
+
     # Get API key from environment variable
     api_key = os.environ.get("GEMINI_API_KEY")
     if not api_key:
-        print("Error: The GEMINI_API_KEY environment variable is not set.")
+        logger.error("The GEMINI_API_KEY environment variable is not set.")
         return
 
     client = genai.Client(api_key=api_key)
@@ -246,26 +344,28 @@ def main():
     print(f"Using output directory: '{args.audio_dir}'")
     print(f"Using model: '{args.model}'")
     print(f"Using delay: {args.delay} seconds")
+    print(f"Using workers: {args.workers}")
     print(f"Supported speakers: Speaker 1 (Iapetus), Speaker 2 (Gacrux)")
     print(f"\nFound {len(tour_data)} tour stops to process from {args.html_file}.")
 
-    # Process each stop
-    success_count = 0
-    for stop_index, stop in enumerate(tour_data):
-        print(f"\n--- Processing Stop {stop_index} ---")
-        was_successful = generate_audio_for_stop(
+    # Process the stops concurrently; the API latency overlaps while the rate limiter
+    # keeps request starts at least args.delay seconds apart
+    rate_limiter = RateLimiter(args.delay)
+
+    def process_stop(stop_index, stop):
+        logger.info("Processing stop %d", stop_index)
+        return generate_audio_for_stop(
             client=client,
             stop=stop,
             stop_index=stop_index,
             output_dir=args.audio_dir,
-            model_name=args.model
+            model_name=args.model,
+            rate_limiter=rate_limiter
         )
 
-        if was_successful:
-            success_count += 1
-            if args.delay > 0 and stop_index < len(tour_data) - 1:
-                print(f"Waiting {args.delay} seconds to avoid rate limiting...")
-                time.sleep(args.delay)
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        results = list(executor.map(process_stop, range(len(tour_data)), tour_data))
+    success_count = sum(results)
 
     print(f"\nAudio generation process complete. Successfully generated {success_count} audio files.")
 
@@ -1,27 +1,126 @@
-from pathlib import Path
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from urllib.parse import quote
+
+# Below this many top-level subdirectories the tree is walked serially, since
+# starting a thread pool costs more than it saves on small trees
+MIN_PARALLEL_SUBDIRECTORIES = 5
+
+# Upper bound on concurrent subtree walks; they mostly wait on the filesystem
+MAX_SCAN_WORKERS = 16
+
+
+def _make_report(file_path: str, directory: str):
+    """Builds the report dictionary for an HTML file found below 'directory'."""
+    report_relative_path = os.path.relpath(file_path, directory)
+    file_stem = os.path.splitext(os.path.basename(file_path))[0]
+    return {
+        'name': file_stem.replace('_', ' ').replace('-', ' '),
+        'path': report_relative_path,
+        'url': f"/reports/{quote(report_relative_path)}"
+    }
+
+
+def _scan_subtree(subdirectory: str, directory: str):
+    """
+    Walks one subdirectory with os.scandir, whose DirEntry type checks reuse the
+    readdir results instead of issuing a stat per entry like Path.rglob.
+    """
+    report_files = []
+    stack = [subdirectory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith('.html') and entry.is_file():
+                        report_files.append(_make_report(entry.path, directory))
+        except OSError:
+            # Skip unreadable directories, as Path.rglob does
+            continue
+    return report_files
 
 
 def find_reports(directory: str):
     """
-    Scans the given directory recursively for HTML files.
+    Scans the given directory recursively for HTML files. When there are
+    several top-level subdirectories they are walked concurrently, which
+    overlaps filesystem latency on large or network-mounted trees.
 
     Args:
         directory: The absolute path to the directory to scan.
 
     Returns:
-        A list of dictionaries, where each dictionary has:
+        A list of dictionaries sorted by path, where each dictionary has:
             'name': The display name of the report (from filename).
             'path': The path to the HTML file relative to the scanned 'directory'.
+            'url': The URL-encoded path the report is served from.
     """
-    report_files = []
-    base_path = Path(directory)
-    if not base_path.is_dir():
+    if not os.path.isdir(directory):
         return []
 
-    for html_file in base_path.rglob('*.html'):
-        report_relative_path = html_file.relative_to(base_path)
-        report_files.append({
-            'name': html_file.stem.replace('_', ' ').replace('-', ' '),
-            'path': str(report_relative_path)
-        })
+    report_files = []
+    subdirectories = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.name.endswith('.html') and entry.is_file():
+                report_files.append(_make_report(entry.path, directory))
+
+    if len(subdirectories) < MIN_PARALLEL_SUBDIRECTORIES:
+        for subdirectory in subdirectories:
+            report_files.extend(_scan_subtree(subdirectory, directory))
+    else:
+        max_workers = min(MAX_SCAN_WORKERS, len(subdirectories))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for subtree_reports in executor.map(_scan_subtree, subdirectories, repeat(directory)):
+                report_files.extend(subtree_reports)
+
+    report_files.sort(key=lambda report: report['path'])
     return report_files
+
+
+@functools.lru_cache(maxsize=8)
+def _find_reports_cached(directory: str, mtime_ns: int):
+    """Memoized scan; the tree's latest mtime is part of the key so changes invalidate it."""
+    return find_reports(directory)
+
+
+def _latest_mtime_ns(directory: str):
+    """
+    Returns the most recent modification time of the directory and its top-level
+    subdirectories, so a report added to a report folder is noticed as well.
+    """
+    latest = os.stat(directory).st_mtime_ns
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                try:
+                    latest = max(latest, entry.stat(follow_symlinks=False).st_mtime_ns)
+                except OSError:
+                    continue
+    return latest
+
+
+def get_reports(directory: str):
+    """
+    Returns the reports in the given directory, rescanning only when the
+    directory or one of its top-level subdirectories has changed since the
+    last scan.
+
+    Args:
+        directory: The absolute path to the directory to scan.
+
+    Returns:
+        The same list of report dictionaries as find_reports.
+    """
+    try:
+        mtime_ns = _latest_mtime_ns(directory)
+    except OSError:
+        return []
+    return _find_reports_cached(directory, mtime_ns)
+
@@ -1,7 +1,13 @@
 import asyncio
-import base64
+import hashlib
+import html
+import os
+import re
+import threading
+from collections import OrderedDict
 
-from .config import REPORTS_BASE_DIR
+from .config import FAST_THUMBNAILS, REPORTS_BASE_DIR, THUMBNAIL_CACHE_DIR
+from .report_scanner import get_reports
 
 # Try to import screenshot dependencies
 try:
@@ -11,61 +17,551 @@ try:
 except ImportError:
     PLAYWRIGHT_AVAILABLE = False
 
-# Cache for thumbnails
-thumbnail_cache = {}
+# Prefer the SIMD-accelerated base64 codec when it is installed
+try:
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
+
+# Run the startup batch on uvloop when it is installed
+try:
+    from uvloop import run as run_event_loop
+except ImportError:
+    from asyncio import run as run_event_loop
+
+# Size of the page pool rendering reports at once in the shared browser
+MAX_CONCURRENT_SCREENSHOTS = min(8, (os.cpu_count() or 1) * 2)
+
+# Layout size of the page a thumbnail is captured from
+VIEWPORT_WIDTH = 1200
+VIEWPORT_HEIGHT = 800
+
+# Rendered width of thumbnails: twice the minimum card width in gallery.css, for HiDPI screens
+THUMBNAIL_WIDTH = 640
+
+# Pixel height of the rendered thumbnails, following the viewport's aspect ratio
+THUMBNAIL_HEIGHT = round(THUMBNAIL_WIDTH * VIEWPORT_HEIGHT / VIEWPORT_WIDTH)
+
+# Keep Chromium from throttling pages that are rendered off-screen, and skip the GPU
+# process and /dev/shm, neither of which helps headless screenshots
+BROWSER_ARGS = [
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-gpu',
+    '--disable-dev-shm-usage',
+]
+
+# Collapse Chromium's process tree when fast thumbnails are enabled; this drops the
+# sandbox, so it stays opt-in
+if FAST_THUMBNAILS:
+    BROWSER_ARGS += [
+        '--single-process',
+        '--no-zygote',
+        '--no-sandbox',
+    ]
+
+# Resources that don't affect a viewport thumbnail and are skipped while rendering
+BLOCKED_RESOURCE_TYPES = {'media', 'font'}
+
+# Remote resources still fetched for thumbnails, since reports are styled and laid out
+# by CDN stylesheets and scripts; anything else remote (XHR, beacons, sockets) is dropped
+REMOTE_RESOURCE_TYPES = {'document', 'stylesheet', 'script', 'image'}
+
+# Analytics and tag-manager scripts never change how a report looks, but can hold
+# the page's network busy
+BLOCKED_URL_PATTERN = re.compile(
+    r'^https?://([^/]*\.)?(google-analytics\.com|googletagmanager\.com|doubleclick\.net'
+    r'|plausible\.io|segment\.(com|io)|hotjar\.com|mixpanel\.com)(/|:|$)'
+)
+
+# Cached thumbnails are named after their SHA-1 cache key: WebP screenshots (JPEG
+# where CDP is unavailable), or SVG text previews for reports that could not be
+# screenshotted
+THUMBNAIL_FILE_PATTERN = re.compile(r'[0-9a-f]{40}\.(webp|jpg|svg)')
+SCREENSHOT_SUFFIXES = ('.webp', '.jpg')
+THUMBNAIL_SUFFIXES = SCREENSHOT_SUFFIXES + ('.svg',)
+
+# Temp files written by store_cached_thumbnail before their atomic rename
+THUMBNAIL_TEMP_FILE_PATTERN = re.compile(r'[0-9a-f]{40}\.\d+\.tmp')
+
+# How much of a report is read to find its title and heading for an SVG preview
+PREVIEW_READ_BYTES = 8192
+TITLE_PATTERN = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+H1_PATTERN = re.compile(r'<h1[^>]*>(.*?)</h1>', re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+SVG_PREVIEW_TEMPLATE = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+    '<rect width="100%" height="100%" fill="#f8f9fa"/>'
+    '<rect width="100%" height="12" fill="#008080"/>'
+    '<foreignObject x="40" y="52" width="{text_width}" height="{text_height}">'
+    '<div xmlns="http://www.w3.org/1999/xhtml" style="font-family:Montserrat,sans-serif;color:#174052;overflow:hidden">'
+    '<div style="font-size:40px;font-weight:700;line-height:1.2">{title}</div>'
+    '<div style="font-size:26px;margin-top:24px;color:#4B6668;line-height:1.3">{heading}</div>'
+    '</div></foreignObject></svg>'
+)
+
+# How long on-demand thumbnail requests are gathered before they are rendered
+# together, since a gallery page load requests every visible card at once
+ON_DEMAND_BATCH_DELAY = 0.05
 
+# Upper bound on the in-memory index of thumbnails; the disk cache holds the rest
+THUMBNAIL_INDEX_SIZE = 4096
 
-async def generate_screenshot(html_file_path, width=1200, height=800):
+# Disk cache file name of the generated thumbnail for each report path, least
+# recently used first
+thumbnail_cache = OrderedDict()
+thumbnail_cache_lock = threading.Lock()
+
+# Long-lived browser shared by all gallery renders while the server is running
+_playwright = None
+shared_browser = None
+
+# Serializes thumbnail batches on an event loop, so concurrent gallery refreshes
+# don't render the same new reports twice
+_generation_lock = None
+_generation_lock_loop = None
+
+# On-demand requests waiting for the next batch, by report path, and the task rendering them
+_on_demand_requests = {}
+_on_demand_task = None
+
+
+def lookup_thumbnail(report_path):
     """
-    Generate a screenshot of an HTML file using Playwright.
+    Return the cached thumbnail file name for a report and mark it as recently used.
     """
-    if not PLAYWRIGHT_AVAILABLE:
+    with thumbnail_cache_lock:
+        cached_file = thumbnail_cache.get(str(report_path))
+        if cached_file is not None:
+            thumbnail_cache.move_to_end(str(report_path))
+        return cached_file
+
+
+def remember_thumbnail(report_path, cached_file):
+    """
+    Record the cached thumbnail file name for a report, evicting the least recently used entries.
+    """
+    with thumbnail_cache_lock:
+        thumbnail_cache[str(report_path)] = cached_file
+        thumbnail_cache.move_to_end(str(report_path))
+        while len(thumbnail_cache) > THUMBNAIL_INDEX_SIZE:
+            thumbnail_cache.popitem(last=False)
+
+
+def forget_thumbnail(report_path):
+    """
+    Drop a report's entry from the index, returning the cached file name it pointed at.
+    """
+    with thumbnail_cache_lock:
+        return thumbnail_cache.pop(str(report_path), None)
+
+
+def get_thumbnail_key(report_path):
+    """
+    Compute the disk cache key for a report from its path, mtime and size,
+    plus the thumbnail width so a resolution change regenerates the cache.
+    """
+    st = (REPORTS_BASE_DIR / report_path).stat()
+    return hashlib.sha1(f"{report_path}:{st.st_mtime_ns}:{st.st_size}:{THUMBNAIL_WIDTH}".encode()).hexdigest()
+
+
+def get_thumbnail_cache_path(key, suffix='.webp'):
+    """
+    Return the path of the cached thumbnail for a cache key.
+    """
+    return THUMBNAIL_CACHE_DIR / f"{key}{suffix}"
+
+
+def find_cached_thumbnail(file_name):
+    """
+    Return the path of a cached thumbnail file, or None if it is not cached.
+    """
+    if not THUMBNAIL_FILE_PATTERN.fullmatch(file_name):
+        return None
+    cache_path = THUMBNAIL_CACHE_DIR / file_name
+    return cache_path if cache_path.is_file() else None
+
+
+def find_cached_screenshot(key):
+    """
+    Return the path of the cached screenshot for a cache key in any format, or None.
+    """
+    for suffix in SCREENSHOT_SUFFIXES:
+        cache_path = get_thumbnail_cache_path(key, suffix)
+        if cache_path.is_file():
+            return cache_path
+    return None
+
+
+def store_cached_thumbnail(report_path, key, image_bytes, suffix='.webp'):
+    """
+    Atomically write a thumbnail to the disk cache and evict the report's previous entry.
+    Returns the cached file name, or None if it could not be written.
+    """
+    try:
+        THUMBNAIL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cache_path = get_thumbnail_cache_path(key, suffix)
+        # Per-process temp name: several workers may render the same report at once
+        tmp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_bytes(image_bytes)
+        os.replace(tmp_path, cache_path)
+
+        # Drop this key's thumbnails in other formats, e.g. the SVG preview a screenshot
+        # replaces; the in-memory index can't find them after a restart
+        for other_suffix in THUMBNAIL_SUFFIXES:
+            if other_suffix != suffix:
+                get_thumbnail_cache_path(key, other_suffix).unlink(missing_ok=True)
+
+        previous_file = lookup_thumbnail(report_path)
+        if previous_file and previous_file != cache_path.name:
+            (THUMBNAIL_CACHE_DIR / previous_file).unlink(missing_ok=True)
+        return cache_path.name
+    except OSError as e:
+        print(f"Error writing thumbnail cache for {report_path}: {e}")
         return None
 
+
+def extract_preview_text(html_content):
+    """
+    Pull the title and first heading out of the start of a report, as plain text.
+    """
+    def first_match(pattern):
+        match = pattern.search(html_content)
+        if not match:
+            return ''
+        return ' '.join(html.unescape(TAG_PATTERN.sub('', match.group(1))).split())
+
+    return first_match(TITLE_PATTERN), first_match(H1_PATTERN)
+
+
+def render_svg_preview(report_path):
+    """
+    Build an SVG text card for a report from its title and first heading, without a browser.
+    """
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page(viewport={'width': width, 'height': height})
-
-            file_url = f"file://{html_file_path.resolve()}"
-            await page.goto(file_url, wait_until='networkidle', timeout=10000)
-
-            screenshot_bytes = await page.screenshot(
-                type='png',
-                full_page=False,
-                clip={'x': 0, 'y': 0, 'width': width, 'height': height}
-            )
-            await browser.close()
-            return screenshot_bytes
+        with open(REPORTS_BASE_DIR / report_path, 'rb') as f:
+            head = f.read(PREVIEW_READ_BYTES).decode('utf-8', errors='ignore')
+    except OSError as e:
+        print(f"Error reading {report_path} for an SVG preview: {e}")
+        return None
+
+    title, heading = extract_preview_text(head)
+    if not title:
+        title = os.path.splitext(os.path.basename(str(report_path)))[0].replace('_', ' ').replace('-', ' ')
+    if heading == title:
+        heading = ''
+
+    return SVG_PREVIEW_TEMPLATE.format(
+        width=THUMBNAIL_WIDTH,
+        height=THUMBNAIL_HEIGHT,
+        text_width=THUMBNAIL_WIDTH - 80,
+        text_height=THUMBNAIL_HEIGHT - 92,
+        title=html.escape(title),
+        heading=html.escape(heading)
+    ).encode('utf-8')
+
+
+def prune_thumbnail_cache(report_paths):
+    """
+    Delete cached thumbnails that no longer belong to any current report version,
+    along with temp files left behind by interrupted writes. Files the cache did
+    not create are left alone, since the cache directory is configurable.
+    """
+    live_keys = set()
+    for report_path in report_paths:
+        try:
+            live_keys.add(get_thumbnail_key(report_path))
+        except OSError:
+            continue
+
+    if not THUMBNAIL_CACHE_DIR.is_dir():
+        return
+    cache_paths = list(THUMBNAIL_CACHE_DIR.iterdir())
+    screenshot_keys = {cache_path.stem for cache_path in cache_paths
+                       if THUMBNAIL_FILE_PATTERN.fullmatch(cache_path.name)
+                       and cache_path.suffix in SCREENSHOT_SUFFIXES}
+    for cache_path in cache_paths:
+        # An SVG preview is superseded once a screenshot exists for the same key
+        is_stale_thumbnail = (THUMBNAIL_FILE_PATTERN.fullmatch(cache_path.name)
+                              and (cache_path.stem not in live_keys
+                                   or (cache_path.suffix == '.svg' and cache_path.stem in screenshot_keys)))
+        if is_stale_thumbnail or THUMBNAIL_TEMP_FILE_PATTERN.fullmatch(cache_path.name):
+            try:
+                cache_path.unlink()
+            except OSError as e:
+                print(f"Error removing stale thumbnail {cache_path.name}: {e}")
+
+
+async def block_heavy_resources(route):
+    """
+    Abort requests for resources that are not needed to render a thumbnail.
+    """
+    request = route.request
+    is_remote = not request.url.startswith('file://')
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or (
+            is_remote and (request.resource_type not in REMOTE_RESOURCE_TYPES
+                           or BLOCKED_URL_PATTERN.match(request.url))):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def capture_thumbnail(context, page, quality=75):
+    """
+    Capture the viewport of a page, returning the image bytes and their file suffix.
+    """
+    try:
+        # Capture through CDP, which can encode WebP: several times smaller than PNG
+        # and noticeably smaller than JPEG for flat report screenshots
+        cdp = await context.new_cdp_session(page)
+    except Exception:
+        # CDP sessions are Chromium-only; fall back to the generic screenshot API,
+        # which has no WebP support
+        return await page.screenshot(type='jpeg', quality=quality, full_page=False), '.jpg'
+
+    try:
+        result = await cdp.send('Page.captureScreenshot', {
+            'format': 'webp',
+            'quality': quality,
+            'optimizeForSpeed': True
+        })
+    finally:
+        await cdp.detach()
+    return b64decode(result['data']), '.webp'
+
+
+async def new_thumbnail_context(browser, width=VIEWPORT_WIDTH, height=VIEWPORT_HEIGHT):
+    """
+    Create a browser context for rendering a batch of thumbnails.
+    """
+    # Lay pages out at full size but rasterize them straight at thumbnail resolution
+    context = await browser.new_context(
+        viewport={'width': width, 'height': height},
+        device_scale_factor=THUMBNAIL_WIDTH / width
+    )
+    await context.route("**/*", block_heavy_resources)
+    return context
+
+
+async def screenshot_report(context, page, html_file_path):
+    """
+    Screenshot an HTML file by navigating a pooled page to it. Returns the image
+    bytes and their file suffix, or None on failure.
+    """
+    try:
+        # Don't wait for network idle: pages that poll or load slow CDN assets would
+        # stall until the timeout, and the thumbnail only needs the first layout.
+        file_url = f"file://{html_file_path.resolve()}"
+        await page.goto(file_url, wait_until='domcontentloaded', timeout=5000)
+        await page.wait_for_timeout(150)
+
+        return await capture_thumbnail(context, page)
     except Exception as e:
         print(f"Error generating screenshot for {html_file_path}: {e}")
         return None
 
 
-def get_thumbnail_for_report(report_path):
+async def start_shared_browser():
     """
-    Generate or retrieve a cached thumbnail for a report.
+    Launch the long-lived browser used for thumbnail generation.
     """
-    cache_key = str(report_path)
-    if cache_key in thumbnail_cache:
-        return thumbnail_cache[cache_key]
+    global _playwright, shared_browser
+    if not PLAYWRIGHT_AVAILABLE or shared_browser is not None:
+        return shared_browser
+
+    try:
+        _playwright = await async_playwright().start()
+        shared_browser = await _playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+    except Exception as e:
+        print(f"Error launching shared browser for thumbnail generation: {e}")
+        await stop_shared_browser()
+    return shared_browser
+
+
+async def stop_shared_browser():
+    """
+    Close the long-lived browser and its Playwright driver.
+    """
+    global _playwright, shared_browser
+    if shared_browser is not None:
+        await shared_browser.close()
+        shared_browser = None
+    if _playwright is not None:
+        await _playwright.stop()
+        _playwright = None
 
-    full_path = REPORTS_BASE_DIR / report_path
-    if not full_path.exists():
-        return None
 
-    if PLAYWRIGHT_AVAILABLE:
+def get_generation_lock():
+    """
+    Return the thumbnail batch lock for the running event loop.
+    """
+    global _generation_lock, _generation_lock_loop
+    loop = asyncio.get_running_loop()
+    if _generation_lock_loop is not loop:
+        _generation_lock = asyncio.Lock()
+        _generation_lock_loop = loop
+    return _generation_lock
+
+
+async def generate_all_thumbnails(report_paths, launch_browser=True):
+    """
+    Generate thumbnails for all reports. Unchanged reports are loaded from the
+    disk cache; the rest are rendered concurrently in a single browser. Without
+    the shared browser, one is launched for the batch unless launch_browser is False.
+    """
+    async with get_generation_lock():
+        await _generate_thumbnails(report_paths, launch_browser)
+
+
+async def request_thumbnail(report_path):
+    """
+    Render a report's thumbnail on demand. Requests arriving together are rendered
+    as one batch, sharing a context and page pool. Returns the cached file name,
+    or None if the path is not a current report or nothing could be rendered.
+    """
+    global _on_demand_task
+    loop = asyncio.get_running_loop()
+    future = _on_demand_requests.get(report_path)
+    if future is None:
+        future = _on_demand_requests[report_path] = loop.create_future()
+    if _on_demand_task is None or _on_demand_task.done():
+        _on_demand_task = loop.create_task(_render_on_demand_batches())
+    # Shielded, so a client that disconnects doesn't cancel the result for other waiters
+    return await asyncio.shield(future)
+
+
+async def _render_on_demand_batches():
+    """
+    Render the queued on-demand requests in batches until none are left.
+    """
+    while _on_demand_requests:
+        await asyncio.sleep(ON_DEMAND_BATCH_DELAY)
+        batch = dict(_on_demand_requests)
+        _on_demand_requests.clear()
+        known_paths = set()
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            screenshot_bytes = loop.run_until_complete(generate_screenshot(full_path))
-            loop.close()
-
-            if screenshot_bytes:
-                base64_image = base64.b64encode(screenshot_bytes).decode('utf-8')
-                thumbnail_cache[cache_key] = base64_image
-                return base64_image
+            # Only scanned reports may be rendered, so arbitrary paths never reach the browser
+            known_paths = {report['path'] for report in get_reports(str(REPORTS_BASE_DIR))}
+            # Never launch a browser per request: without the shared one, cards get SVG previews
+            await generate_all_thumbnails([path for path in batch if path in known_paths], launch_browser=False)
         except Exception as e:
-            print(f"Error in screenshot generation thread: {e}")
+            print(f"Error generating on-demand thumbnails: {e}")
+        finally:
+            for report_path, future in batch.items():
+                if not future.done():
+                    future.set_result(lookup_thumbnail(report_path) if report_path in known_paths else None)
 
-    return None
+
+def index_cached_thumbnails(report_paths):
+    """
+    Point the in-memory index at thumbnails already in the disk cache, without
+    rendering anything. Returns the (report path, cache key) pairs still missing.
+    """
+    pending = []
+    for report_path in report_paths:
+        try:
+            key = get_thumbnail_key(report_path)
+        except OSError:
+            continue
+        cached_file = lookup_thumbnail(report_path)
+        if cached_file and cached_file.startswith(key):
+            continue
+        if cached_file:
+            # The report changed: drop its old thumbnail so the card falls back to the
+            # on-demand endpoint instead of the immutable URL of the outdated image
+            forget_thumbnail(report_path)
+            (THUMBNAIL_CACHE_DIR / cached_file).unlink(missing_ok=True)
+
+        cached_path = find_cached_screenshot(key)
+        if cached_path is not None:
+            remember_thumbnail(report_path, cached_path.name)
+        else:
+            pending.append((report_path, key))
+    return pending
+
+
+async def _generate_thumbnails(report_paths, launch_browser=True):
+    """
+    Render the thumbnails that are missing from the disk cache; callers must hold
+    the generation lock. Without Playwright, reports get SVG text previews instead.
+    """
+    pending = index_cached_thumbnails(report_paths)
+    if not pending:
+        return
+    if not PLAYWRIGHT_AVAILABLE:
+        store_results(pending, [None] * len(pending))
+        return
+
+    async def screenshot_pending(browser):
+        # One context for the whole batch, with a small pool of pages that each work
+        # through the shared queue of reports instead of opening a page per report
+        context = await new_thumbnail_context(browser)
+        queue = iter(enumerate(pending))
+        results = [None] * len(pending)
+
+        async def page_worker():
+            page = await context.new_page()
+            try:
+                for index, (report_path, _) in queue:
+                    if page.is_closed():
+                        page = await context.new_page()
+                    results[index] = await screenshot_report(context, page, REPORTS_BASE_DIR / report_path)
+            finally:
+                await page.close()
+
+        try:
+            await asyncio.gather(*[page_worker() for _ in range(min(MAX_CONCURRENT_SCREENSHOTS, len(pending)))])
+        finally:
+            await context.close()
+        return results
+
+    try:
+        if shared_browser is not None:
+            results = await screenshot_pending(shared_browser)
+        elif not launch_browser:
+            results = [None] * len(pending)
+        else:
+            async with async_playwright() as p:
+                browser = await p.chromium.launch(headless=True, args=BROWSER_ARGS)
+                try:
+                    results = await screenshot_pending(browser)
+                finally:
+                    await browser.close()
+    except Exception as e:
+        print(f"Error launching browser for thumbnail generation: {e}")
+        results = [None] * len(pending)
+
+    store_results(pending, results)
+
+
+def store_results(pending, results):
+    """
+    Cache a batch of screenshots, substituting SVG previews for reports that have none.
+    """
+    for (report_path, key), screenshot in zip(pending, results):
+        if screenshot:
+            screenshot_bytes, suffix = screenshot
+            cached_file = store_cached_thumbnail(report_path, key, screenshot_bytes, suffix=suffix)
+        else:
+            svg_bytes = render_svg_preview(report_path)
+            cached_file = svg_bytes and store_cached_thumbnail(report_path, key, svg_bytes, suffix='.svg')
+        if cached_file:
+            remember_thumbnail(report_path, cached_file)
+
+
+def prewarm_thumbnails(report_paths):
+    """
+    Synchronously prune stale cache entries and render any missing thumbnails in
+    a single batch. Meant to run once at startup, before an event loop is running.
+    """
+    prune_thumbnail_cache(report_paths)
+    run_event_loop(generate_all_thumbnails(report_paths))
+
+
+def get_thumbnail_for_report(report_path):
+    """
+    Retrieve the cached thumbnail file name for a report, if one has been generated.
+    """
+    return lookup_thumbnail(report_path)
@@ -1,109 +1,662 @@
 import argparse
 import asyncio
+import functools
+import json
+import math
 import os
 import pathlib
+import re
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
 import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
 
 import ffmpeg
 from playwright.async_api import async_playwright
 
+# libx264 defaults: 'veryfast' encodes several times faster than the implicit
+# 'medium' at near-identical quality for a mostly static screencast
+DEFAULT_PRESET = 'veryfast'
+DEFAULT_CRF = 23
+
+# Recordings are written, probed and re-read within seconds, so they go to RAM-backed
+# /dev/shm when it has room for a few queued 1080p recordings and their audio.
+# Containers often cap it at 64 MB, in which case the system temp dir is used.
+SHM_DIR = '/dev/shm'
+MIN_SHM_FREE_BYTES = 2 * 1024 ** 3
+DEFAULT_TEMP_VIDEO_DIR = (
+    SHM_DIR if os.path.isdir(SHM_DIR) and shutil.disk_usage(SHM_DIR).free >= MIN_SHM_FREE_BYTES
+    else tempfile.gettempdir()
+)
+
+# Outputs written by the MP4 muxer, which accepts -movflags
+MP4_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+
+# Keep the recorded page running at full speed and skip the shared-memory limits
+# of containers
+RECORDER_BROWSER_ARGS = [
+    '--disable-dev-shm-usage',
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-backgrounding-occluded-windows',
+]
+
+# Reports pull scripts and stylesheets from remote CDNs, so Chromium's sandbox stays
+# on unless --no-sandbox asks for it to be dropped (e.g. in containers running as root)
+NO_SANDBOX_BROWSER_ARGS = ['--no-sandbox']
+
+# Headless servers rarely have a usable GPU; render with SwiftShader instead of probing for one
+HEADLESS_BROWSER_ARGS = ['--use-gl=swiftshader']
+
+# Just before clicking the tour button, the page is covered in black for a few
+# frames. The end of that flash in the recording marks the click on the video's
+# own timeline, free of the recorder's latency.
+FLASH_DURATION_SECONDS = 0.15
+FLASH_MARKER_SCRIPT = """
+async ({selector, durationMs}) => {
+    const overlay = document.createElement('div');
+    overlay.style.cssText = 'position:fixed;inset:0;z-index:2147483647;background:#000';
+    document.body.appendChild(overlay);
+    await new Promise(resolve => setTimeout(resolve, durationMs));
+    overlay.remove();
+    document.querySelector(selector).click();
+}
+"""
+
+# Only the start of the recording is scanned for the flash, up to this long after
+# the click time measured in Python
+FLASH_SEARCH_MARGIN_SECONDS = 5.0
+
+# Black intervals as blackdetect logs them
+BLACK_INTERVAL_PATTERN = re.compile(
+    r'black_start:\s*(\d+(?:\.\d+)?)\s+black_end:\s*(\d+(?:\.\d+)?)\s+black_duration:\s*(\d+(?:\.\d+)?)'
+)
+
+# Only near-pure black counts as the flash, so dark report themes (#151515 and
+# the like) don't; the recording's frame timing can stretch the flash a little
+FLASH_PIXEL_THRESHOLD = 0.02
+FLASH_MIN_SECONDS = FLASH_DURATION_SECONDS / 2
+FLASH_MAX_SECONDS = FLASH_DURATION_SECONDS * 4
+
+# Tours are recorded, and encoded, at the viewport size; no scaling happens in ffmpeg
+DEFAULT_RESOLUTION = {'width': 1920, 'height': 1080}
+
+# ffmpeg processes started by run_ffmpeg, kept where the main thread can stop them
+_running_ffmpeg = set()
+_running_ffmpeg_lock = threading.Lock()
+_ffmpeg_stopped = False
+
+# Range of tempo factors a single atempo filter accepts
+ATEMPO_MIN = 0.5
+ATEMPO_MAX = 2.0
+
+# Hardware H.264 encoders by --hwaccel backend, in the order 'auto' tries them
+HARDWARE_ENCODERS = {
+    'cuda': {
+        'encoder': 'h264_nvenc',
+        'input': {'hwaccel': 'cuda'},
+        'output': {'preset': 'p4', 'tune': 'hq', 'rc': 'vbr', 'cq': 23},
+    },
+    'qsv': {
+        'encoder': 'h264_qsv',
+        'input': {},
+        'output': {'global_quality': 23},
+    },
+    'vaapi': {
+        'encoder': 'h264_vaapi',
+        'input': {'vaapi_device': '/dev/dri/renderD128'},
+        'output': {'qp': 23},
+        # VAAPI encodes from GPU surfaces, so frames are uploaded before encoding
+        'filters': [('format', 'nv12'), ('hwupload',)],
+    },
+    'videotoolbox': {
+        'encoder': 'h264_videotoolbox',
+        'input': {},
+        'output': {'q:v': 65},
+    },
+}
+
+
+# Probing ffmpeg's encoder list takes a few hundred milliseconds, so the result is
+# kept on disk until the ffmpeg binary changes
+ENCODER_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'tour_recorder', 'encoders.json')
+
+# Bumped whenever the parsing below changes, so older cache files are re-probed
+ENCODER_CACHE_VERSION = 2
+
+# Video encoder lines look like " V....D h264_nvenc  NVIDIA NVENC H.264 encoder": a
+# six-character capability field, then the name. The legend line " V..... = Video"
+# has no name and doesn't match.
+VIDEO_ENCODER_PATTERN = re.compile(r'^\s*V[.A-Z]{5}\s+([\w-]+)\s', re.MULTILINE)
+
+
+@functools.lru_cache(maxsize=1)
+def get_available_encoders():
+    """
+    Returns the names of the video encoders compiled into the local ffmpeg build,
+    reusing the cached list while the ffmpeg binary's mtime is unchanged.
+    """
+    ffmpeg_path = shutil.which('ffmpeg')
+    if ffmpeg_path is None:
+        return frozenset()
+    ffmpeg_mtime_ns = os.stat(ffmpeg_path).st_mtime_ns
 
-async def record_smart_report_tour(report_uri: str, temp_video_path: str, resolution: dict, headless: bool):
+    try:
+        with open(ENCODER_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if (cached.get('version') == ENCODER_CACHE_VERSION and cached['ffmpeg_path'] == ffmpeg_path
+                and cached['ffmpeg_mtime_ns'] == ffmpeg_mtime_ns):
+            return frozenset(cached['encoders'])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+
+    try:
+        result = subprocess.run([ffmpeg_path, '-hide_banner', '-encoders'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return frozenset()
+    encoders = frozenset(VIDEO_ENCODER_PATTERN.findall(result.stdout))
+
+    try:
+        os.makedirs(os.path.dirname(ENCODER_CACHE_PATH), exist_ok=True)
+        with open(ENCODER_CACHE_PATH, 'w', encoding='utf-8') as f:
+            json.dump({'version': ENCODER_CACHE_VERSION, 'ffmpeg_path': ffmpeg_path, 'ffmpeg_mtime_ns': ffmpeg_mtime_ns,
+                       'encoders': sorted(encoders)}, f)
+    except OSError:
+        pass
+    return encoders
+
+
+def software_encoder(preset: str = DEFAULT_PRESET, crf: int = DEFAULT_CRF):
+    """CPU encoder settings, used when no hardware encoder is available or one fails."""
+    return {
+        'encoder': 'libx264',
+        'input': {},
+        # threads=0 lets x264 use every core. Tours are mostly still pages with short
+        # scrolls, so long GOPs and the stillimage tune spend fewer bits and less
+        # motion search on frames that barely change.
+        'output': {'preset': preset, 'crf': crf, 'threads': 0, 'tune': 'stillimage',
+                   'g': 300, 'bf': 4, 'keyint_min': 30, 'sc_threshold': 40},
+    }
+
+
+def select_video_encoder(hwaccel: str, preset: str = DEFAULT_PRESET, crf: int = DEFAULT_CRF):
     """
-    Launches a browser, records a video of the Smart Report tour from a local file,
-    saves it to a temporary path, and returns the measured setup time.
+    Picks the H.264 encoder settings for the requested --hwaccel backend. 'auto'
+    takes the first hardware encoder ffmpeg was built with; anything unavailable
+    falls back to libx264 with the given preset and CRF.
     """
-    print("🚀 Starting the recording process...")
-    async with async_playwright() as p:
-        # Start the timer as soon as the context with recording is created
-        start_time = time.monotonic()
+    if hwaccel == 'none':
+        return software_encoder(preset, crf)
 
-        print("🖥️  Launching browser...")
-        browser = await p.chromium.launch(headless=headless)
+    available = get_available_encoders()
+    candidates = HARDWARE_ENCODERS if hwaccel == 'auto' else {hwaccel: HARDWARE_ENCODERS[hwaccel]}
+    for settings in candidates.values():
+        if settings['encoder'] in available:
+            return settings
 
-        print("📹 Creating new browser context with video recording enabled...")
-        context = await browser.new_context(
-            record_video_dir="temp_videos/",
-            record_video_size={'width': resolution['width'], 'height': resolution['height']},
-            viewport={'width': resolution['width'], 'height': resolution['height']}
+    if hwaccel != 'auto':
+        print(f"⚠️  {HARDWARE_ENCODERS[hwaccel]['encoder']} is not available in this ffmpeg build. Using libx264.")
+    return software_encoder(preset, crf)
+
+
+def terminate_running_ffmpeg():
+    """
+    Terminates the ffmpeg processes started by run_ffmpeg, and any it starts from
+    now on. Signals only reach the main thread, so this is how Ctrl+C stops an
+    encode running in a worker thread.
+    """
+    global _ffmpeg_stopped
+    with _running_ffmpeg_lock:
+        _ffmpeg_stopped = True
+        for process in _running_ffmpeg:
+            process.terminate()
+
+
+def reset_ffmpeg_stop():
+    """
+    Lets run_ffmpeg start processes again after terminate_running_ffmpeg, so one
+    interrupted batch doesn't stop every later batch in the same process.
+    """
+    global _ffmpeg_stopped
+    with _running_ffmpeg_lock:
+        _ffmpeg_stopped = False
+
+
+def run_ffmpeg(stream):
+    """
+    Runs an ffmpeg command in the background, printing its progress on a single
+    line instead of ffmpeg's full log. Raises ffmpeg.Error if it fails, like
+    stream.run(). The process can be stopped from another thread with
+    terminate_running_ffmpeg.
+    """
+    process = (
+        stream.global_args('-progress', 'pipe:1', '-nostats')
+        .run_async(pipe_stdout=True, pipe_stderr=True, overwrite_output=True)
+    )
+    with _running_ffmpeg_lock:
+        _running_ffmpeg.add(process)
+        if _ffmpeg_stopped:
+            process.terminate()
+
+    # Drain the log concurrently so a full stderr pipe can never stall ffmpeg
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+
+    try:
+        progress = {}
+        for line in process.stdout:
+            key, _, value = line.decode('utf-8', errors='replace').strip().partition('=')
+            progress[key] = value
+            # -progress ends each block of key=value lines with a 'progress' line
+            if key == 'progress':
+                print(f"\r⏳ frame {progress.get('frame', '?')}, {progress.get('out_time', '?')}", end='', flush=True)
+        print()
+        process.wait()
+    except BaseException:
+        # Don't leave ffmpeg running when this thread itself is interrupted
+        process.terminate()
+        process.wait()
+        raise
+    finally:
+        stderr_reader.join()
+        with _running_ffmpeg_lock:
+            _running_ffmpeg.discard(process)
+
+    stderr = b''.join(stderr_chunks)
+    if process.returncode < 0:
+        raise ffmpeg.Error('ffmpeg', None, stderr)
+    if process.returncode != 0:
+        # The log was held back while ffmpeg ran; show it now that it explains a failure
+        print(stderr.decode('utf-8', errors='replace'))
+        raise ffmpeg.Error('ffmpeg', None, stderr)
+
+
+def encode_final_video(temp_video_path: str, audio_stream, final_output_path: str, trim_start_seconds: float, encoder: dict):
+    """
+    Trims the silent video, muxes in the synced audio and encodes the final file.
+    This must stay the only MP4 stage: +faststart rewrites the whole file once it
+    is written, so any intermediate MP4 output would pay for that pass again.
+    """
+    # Input the video and trim the measured setup time from the start
+    video_input = ffmpeg.input(temp_video_path, ss=trim_start_seconds, **encoder['input'])
+    video_stream = video_input['v']
+    for video_filter in encoder.get('filters', []):
+        video_stream = video_stream.filter(*video_filter)
+
+    # Put the moov atom up front so players can start without seeking to the end
+    container_options = {}
+    if final_output_path.lower().endswith(MP4_EXTENSIONS):
+        container_options['movflags'] = '+faststart'
+
+    run_ffmpeg(
+        ffmpeg.output(
+            video_stream,
+            audio_stream,
+            final_output_path,
+            # Keep the recorder's frame timestamps; forcing a fixed rate made ffmpeg
+            # duplicate and drop frames across the whole (variable-rate) recording
+            vsync='passthrough',
+            vcodec=encoder['encoder'],
+            acodec='aac',
+            shortest=None,  # We are handling duration manually
+            **container_options,
+            **encoder['output']
+        )
+    )
+
+
+def remux_final_video(temp_video_path: str, audio_stream, final_output_path: str, trim_start_seconds: float):
+    """
+    Muxes the synced audio into a WebM without re-encoding the recorded video.
+    Playwright already records VP8 WebM, so only the audio needs encoding.
+    """
+    # With stream copy the cut lands on the keyframe at or before the setup time
+    video_input = ffmpeg.input(temp_video_path, ss=trim_start_seconds)
+    run_ffmpeg(
+        ffmpeg.output(
+            video_input['v'],
+            audio_stream,
+            final_output_path,
+            vcodec='copy',
+            acodec='libopus',
+            shortest=None  # We are handling duration manually
+        )
+    )
+
+
+def read_wav_duration(clip_path: str):
+    """
+    Reads a PCM WAV file's duration from its RIFF header, without spawning ffprobe.
+    Returns None when the file isn't a WAV file this can parse.
+    """
+    with open(clip_path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            return None
+
+        byte_rate = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size + chunk_size % 2)
+                byte_rate = struct.unpack('<I', fmt[8:12])[0]
+            elif chunk_id == b'data':
+                return chunk_size / byte_rate if byte_rate else None
+            else:
+                # Chunks are padded to an even size
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def concatenate_wav_files(clip_paths: list, merged_path: str) -> bool:
+    """
+    Joins WAV clips into one file by appending their PCM frames. Returns False,
+    without writing anything, when the clips don't all share one format.
+    """
+    try:
+        clips = [wave.open(clip_path, 'rb') for clip_path in clip_paths]
+    except (OSError, EOFError, wave.Error):
+        return False
+
+    try:
+        # Compare everything but the frame count
+        formats = {clip.getparams()[:3] + clip.getparams()[4:] for clip in clips}
+        if len(formats) != 1:
+            return False
+
+        with wave.open(merged_path, 'wb') as merged:
+            merged.setparams(clips[0].getparams())
+            for clip in clips:
+                merged.writeframes(clip.readframes(clip.getnframes()))
+        return True
+    finally:
+        for clip in clips:
+            clip.close()
+
+
+def apply_tempo(audio_stream, factor: float):
+    """
+    Changes the audio tempo by 'factor'. A single atempo filter only accepts
+    factors in [0.5, 2.0], so larger changes are chained, e.g. 3.0 -> 2.0 * 1.5.
+    Raises ValueError for factors that aren't positive and finite.
+    """
+    if not (math.isfinite(factor) and factor > 0):
+        raise ValueError(f"Cannot apply audio tempo factor {factor}: it must be positive and finite")
+    while factor > ATEMPO_MAX:
+        audio_stream = ffmpeg.filter(audio_stream, 'atempo', ATEMPO_MAX)
+        factor /= ATEMPO_MAX
+    while factor < ATEMPO_MIN:
+        audio_stream = ffmpeg.filter(audio_stream, 'atempo', ATEMPO_MIN)
+        factor /= ATEMPO_MIN
+    return ffmpeg.filter(audio_stream, 'atempo', factor)
+
+
+def detect_flash_marker(temp_video_path: str, measured_click_seconds: float):
+    """
+    Returns the recording timestamp at which the pre-click flash ends, or None if
+    no full-frame black interval of about the flash's length shows up. Of several
+    candidates, the one ending closest to the click time measured while
+    recording wins.
+    """
+    try:
+        _, stderr = (
+            ffmpeg.input(temp_video_path, t=measured_click_seconds + FLASH_SEARCH_MARGIN_SECONDS)
+            .filter('blackdetect', d=0, pic_th=0.98, pix_th=FLASH_PIXEL_THRESHOLD)
+            .output('-', format='null')
+            .run(capture_stdout=True, capture_stderr=True)
         )
+    except ffmpeg.Error:
+        return None
 
-        print("📄 Creating new page...")
-        page = await context.new_page()
+    flash_ends = [
+        float(black_end)
+        for _, black_end, black_duration in BLACK_INTERVAL_PATTERN.findall(stderr.decode('utf-8', errors='replace'))
+        if FLASH_MIN_SECONDS <= float(black_duration) <= FLASH_MAX_SECONDS
+    ]
+    if not flash_ends:
+        return None
+    return min(flash_ends, key=lambda flash_end: abs(flash_end - measured_click_seconds))
 
-        print(f"🧭 Navigating to: {report_uri}")
-        await page.goto(report_uri, wait_until='networkidle')
-        print("✅ Page loaded and ready.")
 
-        # Give the page a moment to settle before we do anything
-        await asyncio.sleep(2)
+def get_audio_duration(clip_path: str):
+    """Returns an audio clip's duration in seconds, probing with ffprobe only for non-WAV files."""
+    try:
+        duration = read_wav_duration(clip_path)
+    except (OSError, struct.error):
+        duration = None
+    if duration is None:
+        duration = float(ffmpeg.probe(clip_path)['format']['duration'])
+    return duration
 
-        tour_button_selector = '#tour-button'
-        play_icon_selector = '.fa-play'
-        pause_icon_selector = '.fa-pause'
 
-        print("🔍 Searching for the tour button...")
-        await page.wait_for_selector(tour_button_selector)
-        print("▶️ Tour button found.")
+class TourRecorder:
+    """
+    Records Smart Report tours with a single long-lived browser. Each recording
+    gets its own browser context, so only the first one pays for launching Chromium.
 
-        print("🖱️  Clicking 'Play Tour' button...")
-        await page.click(tour_button_selector)
+    Usage:
+        async with TourRecorder(headless=True) as recorder:
+            setup_duration = await recorder.record(report_uri, temp_video_path, resolution)
+    """
 
-        # Capture the exact time the tour was started
-        click_time = time.monotonic()
-        setup_duration = click_time - start_time
-        print(f"⏱️  Measured setup time to trim: {setup_duration:.2f} seconds.")
+    def __init__(self, headless: bool = True, sandbox: bool = True):
+        self.headless = headless
+        self.sandbox = sandbox
+        self._playwright = None
+        self.browser = None
 
-        print("⏳ Tour has started. Now waiting for it to complete...")
-        await page.wait_for_selector(f"{tour_button_selector} i{pause_icon_selector}")
-        print("⏸️  Pause icon detected. Tour is officially running.")
+    async def __aenter__(self):
+        print("🖥️  Launching browser...")
+        self._playwright = await async_playwright().start()
+        try:
+            browser_args = (RECORDER_BROWSER_ARGS
+                            + (HEADLESS_BROWSER_ARGS if self.headless else [])
+                            + ([] if self.sandbox else NO_SANDBOX_BROWSER_ARGS))
+            self.browser = await self._playwright.chromium.launch(headless=self.headless, args=browser_args)
+        except Exception:
+            await self._playwright.stop()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.browser.close()
+        await self._playwright.stop()
+
+    async def record(self, report_uri: str, temp_video_path: str, resolution: dict):
+        """
+        Records a video of the Smart Report tour from a local file, saves it to a
+        temporary path, and returns the measured setup time.
+        """
+        print("🚀 Starting the recording process...")
 
-        await page.wait_for_selector(f"{tour_button_selector} i{play_icon_selector}", timeout=600000)
-        print("🏁 Play icon detected. Tour has finished.")
+        # Start the timer as soon as the context with recording is created
+        start_time = time.monotonic()
 
-        await asyncio.sleep(2)
+        print("📹 Creating new browser context with video recording enabled...")
+        context = await self.browser.new_context(
+            record_video_dir=os.path.dirname(temp_video_path) or '.',
+            record_video_size={'width': resolution['width'], 'height': resolution['height']},
+            viewport={'width': resolution['width'], 'height': resolution['height']}
+        )
 
-        print("🛑 Closing browser context...")
-        await context.close()
+        try:
+            print("📄 Creating new page...")
+            page = await context.new_page()
+
+            # Don't wait for network idle: analytics beacons or polling would stall it.
+            # The tour button below is the real readiness gate.
+            print(f"🧭 Navigating to: {report_uri}")
+            await page.goto(report_uri, wait_until='domcontentloaded')
+            print("✅ Page loaded and ready.")
+
+            tour_button_selector = '#tour-button'
+            play_icon_selector = '.fa-play'
+            pause_icon_selector = '.fa-pause'
+
+            print("🔍 Searching for the tour button...")
+            await page.wait_for_selector(tour_button_selector, state='visible')
+            print("▶️ Tour button found.")
+
+            # Keep fallback fonts from flashing in the recording
+            await page.evaluate("document.fonts.ready.then(() => true)")
+
+            print("🖱️  Clicking 'Play Tour' button...")
+            # Click in-page, right after the flash marker: the button is already known to
+            # be visible, so Playwright's actionability checks and their extra round-trips are skipped
+            before_click = time.monotonic()
+            await page.evaluate(FLASH_MARKER_SCRIPT, {'selector': tour_button_selector,
+                                                      'durationMs': FLASH_DURATION_SECONDS * 1000})
+            after_click = time.monotonic()
+
+            # Estimate the time the tour was started, used if the flash can't be found in
+            # the video: the click ran at the end of the evaluate round-trip, after the
+            # flash, so take the midpoint of the part that follows it
+            click_time = (before_click + FLASH_DURATION_SECONDS + after_click) / 2
+            setup_duration = click_time - start_time
+            print(f"⏱️  Measured setup time to trim: {setup_duration:.2f} seconds.")
+
+            print("⏳ Tour has started. Now waiting for it to complete...")
+            await page.wait_for_selector(f"{tour_button_selector} i{pause_icon_selector}")
+            print("⏸️  Pause icon detected. Tour is officially running.")
+
+            await page.wait_for_selector(f"{tour_button_selector} i{play_icon_selector}", timeout=600000)
+            print("🏁 Play icon detected. Tour has finished.")
+
+            await asyncio.sleep(2)
+        finally:
+            print("🛑 Closing browser context...")
+            await context.close()
 
         video_temp_path_raw = await page.video.path()
-        os.rename(video_temp_path_raw, temp_video_path)
+        if os.path.abspath(video_temp_path_raw) != os.path.abspath(temp_video_path):
+            # shutil.move falls back to copy + unlink when os.rename would fail across devices
+            shutil.move(video_temp_path_raw, temp_video_path)
         print(f"📼 Silent video successfully recorded and stored at: {temp_video_path}")
 
         # Return the measured setup time for the sync process
         return setup_duration
 
 
-def merge_audio_and_video(temp_video_path: str, audio_dir: str, num_audio_clips: int, final_output_path: str, trim_start_seconds: float):
+async def record_smart_report_tour(report_uri: str, temp_video_path: str, resolution: dict, headless: bool):
+    """
+    Launches a browser, records a video of the Smart Report tour from a local file,
+    saves it to a temporary path, and returns the measured setup time.
+    """
+    async with TourRecorder(headless=headless) as recorder:
+        return await recorder.record(report_uri, temp_video_path, resolution)
+
+
+async def record_and_merge_tours(jobs: list, resolution: dict, headless: bool, hwaccel: str = 'auto',
+                                preset: str = DEFAULT_PRESET, crf: int = DEFAULT_CRF, sandbox: bool = True):
+    """
+    Records tours in one browser and merges each recording with its audio while
+    the next one is being recorded. The browser and ffmpeg compete for different
+    resources, so a batch takes about as long as the slower stage instead of the
+    sum of both. Each job is a (report_uri, temp_video_path, audio_dir, output_file) tuple.
+    """
+    # A previous batch may have been interrupted; this one starts with ffmpeg allowed
+    reset_ffmpeg_stop()
+
+    # Recordings waiting for ffmpeg; when it falls behind, the recorder waits for it
+    recorded = asyncio.Queue(maxsize=2)
+    loop = asyncio.get_running_loop()
+
+    async def merge_recordings():
+        # ffmpeg runs in a subprocess, so one worker thread is enough to keep it off the event loop
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            while True:
+                item = await recorded.get()
+                if item is None:
+                    return
+                temp_video_path, audio_dir, output_file, trim_duration = item
+                await loop.run_in_executor(executor, functools.partial(
+                    merge_audio_and_video,
+                    temp_video_path=temp_video_path,
+                    audio_dir=audio_dir,
+                    num_audio_clips=10,  # As defined in the report's tourData
+                    final_output_path=output_file,
+                    trim_start_seconds=trim_duration,
+                    hwaccel=hwaccel,
+                    preset=preset,
+                    crf=crf
+                ))
+
+    merger = asyncio.create_task(merge_recordings())
+    try:
+        async with TourRecorder(headless=headless, sandbox=sandbox) as recorder:
+            for report_uri, temp_video_path, audio_dir, output_file in jobs:
+                try:
+                    trim_duration = await recorder.record(report_uri, temp_video_path, resolution)
+                except Exception as e:
+                    print(f"An error occurred while recording {report_uri}: {e}")
+                    continue
+                if os.path.exists(temp_video_path):
+                    await recorded.put((temp_video_path, audio_dir, output_file, trim_duration))
+        await recorded.put(None)
+        await merger
+    except (asyncio.CancelledError, KeyboardInterrupt):
+        # Ctrl+C reaches only the main thread; stop the merge worker's ffmpeg from here
+        # rather than waiting for its encode to finish
+        print("\n🛑 Interrupted. Stopping ffmpeg...")
+        merger.cancel()
+        terminate_running_ffmpeg()
+        raise
+    except Exception:
+        # The recorder failed: let the merges already queued finish
+        await recorded.put(None)
+        await merger
+        raise
+
+
+def merge_audio_and_video(temp_video_path: str, audio_dir: str, num_audio_clips: int, final_output_path: str, trim_start_seconds: float,
+                          hwaccel: str = 'auto', preset: str = DEFAULT_PRESET, crf: int = DEFAULT_CRF):
     """
     Stitches audio, syncs it with the video by adjusting tempo based on a measured
     setup time, and merges them into a final file.
     """
     print("\n🎶--- Starting audio/video merge and sync process ---")
+    merged_audio_path = os.path.splitext(temp_video_path)[0] + "_audio.wav"
     try:
         # --- 1. Calculate Audio Duration ---
-        audio_inputs = []
-        total_audio_duration = 0.0
         print("🔍 Locating audio clips and calculating total duration...")
-        for i in range(num_audio_clips):
-            clip_path = os.path.join(audio_dir, f"stop_{i}.wav")
+        clip_paths = [os.path.join(audio_dir, f"stop_{i}.wav") for i in range(num_audio_clips)]
+        for clip_path in clip_paths:
             if not os.path.exists(clip_path):
                 raise FileNotFoundError(f"Audio file not found: {clip_path}")
 
-            probe = ffmpeg.probe(clip_path)
-            duration = float(probe['format']['duration'])
-            total_audio_duration += duration
-            audio_inputs.append(ffmpeg.input(clip_path))
-        print(f"🎧 Found {len(audio_inputs)} audio clips. Total audio duration: {total_audio_duration:.2f}s")
-
-        # --- 2. Use Measured Trim Time to Calculate Video Tour Duration ---
-        video_probe = ffmpeg.probe(temp_video_path)
+        # Any ffprobe runs (the video, and clips that aren't plain WAV) block on a
+        # subprocess, so they overlap in a thread pool instead of running back to back
+        with ThreadPoolExecutor(max_workers=len(clip_paths) + 2) as executor:
+            video_probe_future = executor.submit(ffmpeg.probe, temp_video_path)
+            flash_marker_future = executor.submit(detect_flash_marker, temp_video_path, trim_start_seconds)
+            clip_durations = list(executor.map(get_audio_duration, clip_paths))
+            video_probe = video_probe_future.result()
+            flash_marker_seconds = flash_marker_future.result()
+
+        # The flash marks the click on the video's own timeline; the time measured
+        # while recording is only the fallback
+        if flash_marker_seconds is not None:
+            print(f"🎯 Found the click marker in the video at {flash_marker_seconds:.2f}s "
+                  f"(measured while recording: {trim_start_seconds:.2f}s).")
+            trim_start_seconds = flash_marker_seconds
+
+        total_audio_duration = sum(clip_durations)
+        print(f"🎧 Found {len(clip_paths)} audio clips. Total audio duration: {total_audio_duration:.2f}s")
+
+        # --- 2. Use the Trim Time to Calculate Video Tour Duration ---
         raw_video_duration = float(video_probe['format']['duration'])
         print(f"📹 Raw silent video duration: {raw_video_duration:.2f}s")
 
         # This is the actual duration of the visual tour part of the video
         effective_tour_duration = raw_video_duration - trim_start_seconds
-        print(f"✂️ Using measured setup time of {trim_start_seconds:.2f}s. Effective tour video duration: {effective_tour_duration:.2f}s")
+        print(f"✂️ Using setup time of {trim_start_seconds:.2f}s. Effective tour video duration: {effective_tour_duration:.2f}s")
 
         # --- 3. Calculate Audio Tempo Adjustment ---
         # This will slightly speed up or slow down the audio to match the video's real-time length.
@@ -112,101 +665,199 @@ def merge_audio_and_video(temp_video_path: str, audio_dir: str, num_audio_clips:
         print(f"⚖️  Calculated audio tempo adjustment factor: {tempo_adjustment_factor:.4f}")
 
         # --- 4. Define FFmpeg Streams with Filters ---
-        # Concatenate audio clips
-        concatenated_audio = ffmpeg.concat(*audio_inputs, v=0, a=1)
+        # Concatenate audio clips. Same-format WAVs are joined in Python so the
+        # encode reads a single input instead of decoding every clip in a concat filter.
+        if concatenate_wav_files(clip_paths, merged_audio_path):
+            concatenated_audio = ffmpeg.input(merged_audio_path)['a']
+        else:
+            concatenated_audio = ffmpeg.concat(*[ffmpeg.input(clip_path) for clip_path in clip_paths], v=0, a=1)
         # Apply the tempo filter to the concatenated audio to match the video's tour length
-        synced_audio = ffmpeg.filter(concatenated_audio, 'atempo', tempo_adjustment_factor)
-
-        # Input the video and trim the measured setup time from the start
-        video_input = ffmpeg.input(temp_video_path, ss=trim_start_seconds)
-
-        print(f"🎞️  Merging and re-encoding video into '{final_output_path}'...")
-        (
-            ffmpeg.output(
-                video_input['v'],
-                synced_audio,
-                final_output_path,
-                # Set a standard framerate to fix sync issues
-                r=30,
-                vcodec='libx264',
-                acodec='aac',
-                shortest=None  # We are handling duration manually
-            )
-            .run(quiet=False, overwrite_output=True)
-        )
+        synced_audio = apply_tempo(concatenated_audio, tempo_adjustment_factor)
+
+        if final_output_path.lower().endswith('.webm'):
+            print(f"🎞️  Merging audio into '{final_output_path}' without re-encoding the video...")
+            remux_final_video(temp_video_path, synced_audio, final_output_path, trim_start_seconds)
+            print(f"✅ Final video saved to: {final_output_path}")
+            return
+
+        encoder = select_video_encoder(hwaccel, preset, crf)
+        print(f"🎞️  Merging and re-encoding video into '{final_output_path}' with {encoder['encoder']}...")
+        try:
+            encode_final_video(temp_video_path, synced_audio, final_output_path, trim_start_seconds, encoder)
+        except ffmpeg.Error:
+            # A hardware encoder can be compiled in without a usable device behind it
+            if encoder['encoder'] == 'libx264':
+                raise
+            print(f"⚠️  {encoder['encoder']} failed. Retrying with libx264...")
+            encode_final_video(temp_video_path, synced_audio, final_output_path, trim_start_seconds,
+                               software_encoder(preset, crf))
 
         print(f"✅ Final video saved to: {final_output_path}")
 
     except Exception as e:
         print(f"An error occurred during merge: {e}")
     finally:
-        if os.path.exists(temp_video_path):
-            print(f"🧹 Cleaning up intermediate file: {temp_video_path}")
-            os.remove(temp_video_path)
-        if os.path.exists('temp_videos') and not os.listdir('temp_videos'):
-            os.rmdir('temp_videos')
+        for intermediate_path in (temp_video_path, merged_audio_path):
+            if os.path.exists(intermediate_path):
+                print(f"🧹 Cleaning up intermediate file: {intermediate_path}")
+                os.remove(intermediate_path)
+
+
+def parse_resolution(value: str):
+    """Parses a WIDTHxHEIGHT argument into the resolution dict used for recording."""
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid resolution '{value}', expected WIDTHxHEIGHT")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"invalid resolution '{value}', expected WIDTHxHEIGHT")
+    # H.264 with 4:2:0 chroma can't encode odd dimensions; fail before recording, not after
+    if width % 2 or height % 2:
+        raise argparse.ArgumentTypeError(f"invalid resolution '{value}', width and height must be even")
+    return {'width': width, 'height': height}
 
 
 def main():
     """Main function to parse arguments and orchestrate the video generation."""
     parser = argparse.ArgumentParser(
-        description="Record a video tour of a Smart Report HTML file and merge it with audio.",
+        description="Record video tours of Smart Report HTML files and merge them with audio.",
         formatter_class=argparse.RawTextHelpFormatter
     )
     parser.add_argument(
         '-i', '--html-file',
-        required=True,
-        help='Path to the input Smart Report HTML file.'
+        nargs='+',
+        default=[],
+        help='Path to the input Smart Report HTML file. Several files are recorded one after\n'
+             'another in the same browser.'
+    )
+    parser.add_argument(
+        '--batch',
+        help='Text file listing Smart Report HTML files, one per line, to record in addition\n'
+             'to any given with -i. Each video is encoded while the next one records.'
     )
     parser.add_argument(
         '-o', '--output-file',
         default='Smart_Report_Tour_FINAL.mp4',
-        help='Path for the final output MP4 video. (Default: Smart_Report_Tour_FINAL.mp4)'
+        help='Path for the final output video. A .webm path keeps the recorded video stream\n'
+             'as-is instead of re-encoding it to H.264. With several input files, each video\n'
+             'is saved next to its report as <report>_Tour with this file\'s extension.\n'
+             '(Default: Smart_Report_Tour_FINAL.mp4)'
     )
     parser.add_argument(
         '--headed',
         action='store_true',
         help='If specified, the browser will be visible during recording (runs in headed mode).'
     )
+    parser.add_argument(
+        '--no-sandbox',
+        action='store_true',
+        help='Run Chromium without its sandbox, e.g. in containers running as root. Reports\n'
+             'load remote scripts, so only use this for reports you trust.'
+    )
+    parser.add_argument(
+        '--hwaccel',
+        choices=['auto', *HARDWARE_ENCODERS, 'none'],
+        default='auto',
+        help='Hardware H.264 encoder to use. "auto" picks the first one available and\n'
+             '"none" forces libx264 on the CPU. (Default: auto)'
+    )
+    parser.add_argument(
+        '--preset',
+        default=DEFAULT_PRESET,
+        choices=['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow'],
+        help=f'libx264 speed/compression preset. (Default: {DEFAULT_PRESET})'
+    )
+    parser.add_argument(
+        '--crf',
+        type=int,
+        default=DEFAULT_CRF,
+        help=f'libx264 constant rate factor; lower is higher quality. (Default: {DEFAULT_CRF})'
+    )
+    parser.add_argument(
+        '--resolution',
+        type=parse_resolution,
+        default=DEFAULT_RESOLUTION,
+        help='Size of the browser viewport and of the recording, as WIDTHxHEIGHT. Videos are\n'
+             'encoded at this size; 1280x720 records and encodes much faster.\n'
+             f'(Default: {DEFAULT_RESOLUTION["width"]}x{DEFAULT_RESOLUTION["height"]})'
+    )
+    parser.add_argument(
+        '--temp-dir',
+        default=DEFAULT_TEMP_VIDEO_DIR,
+        help='Directory in which a temporary folder for the intermediate silent recordings is\n'
+             f'created. /dev/shm keeps them in memory. (Default: {DEFAULT_TEMP_VIDEO_DIR})'
+    )
     args = parser.parse_args()
 
-    # --- Derive paths from arguments ---
-    report_html_path = args.html_file
-    if not os.path.exists(report_html_path):
-        print(f"Error: Cannot find HTML file at: {report_html_path}")
-        return
+    html_files = list(args.html_file)
+    if args.batch:
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            html_files.extend(line.strip() for line in f if line.strip())
+    if not html_files:
+        parser.error("no input files: pass -i/--html-file or --batch")
+
+    if len(html_files) == 1:
+        output_files = [args.output_file]
+    else:
+        # Several reports: name each video after its report, next to the report
+        extension = os.path.splitext(args.output_file)[1] or '.mp4'
+        output_files = [os.path.splitext(html_file)[0] + "_Tour" + extension for html_file in html_files]
+
+    main_batch(
+        html_files=html_files,
+        output_files=output_files,
+        headless=not args.headed,
+        hwaccel=args.hwaccel,
+        preset=args.preset,
+        crf=args.crf,
+        temp_video_dir=args.temp_dir,
+        resolution=args.resolution,
+        sandbox=not args.no_sandbox
+    )
 
-    report_dir = os.path.dirname(report_html_path)
-    audio_dir = os.path.join(report_dir, "Audio")
-    if not os.path.exists(audio_dir):
-        print(f"Error: Cannot find 'Audio' directory in the same folder as the HTML file: {audio_dir}")
-        return
 
-    report_uri = pathlib.Path(report_html_path).as_uri()
-    temp_video_dir = "temp_videos"
-    temp_video_path = os.path.join(temp_video_dir, "silent_video.webm")
+def main_batch(html_files: list, output_files: list, headless: bool = True, hwaccel: str = 'auto',
+               preset: str = DEFAULT_PRESET, crf: int = DEFAULT_CRF, temp_video_dir: str = DEFAULT_TEMP_VIDEO_DIR,
+               resolution: dict = None, sandbox: bool = True):
+    """
+    Records the tours of several Smart Report HTML files with a single browser,
+    then merges each recording with its report's audio.
+    """
+    # --- Derive paths from arguments ---
+    jobs = []
+    for index, (report_html_path, output_file) in enumerate(zip(html_files, output_files)):
+        if not os.path.exists(report_html_path):
+            print(f"Error: Cannot find HTML file at: {report_html_path}")
+            continue
+
+        report_dir = os.path.dirname(report_html_path)
+        audio_dir = os.path.join(report_dir, "Audio")
+        if not os.path.exists(audio_dir):
+            print(f"Error: Cannot find 'Audio' directory in the same folder as the HTML file: {audio_dir}")
+            continue
+
+        report_uri = pathlib.Path(report_html_path).as_uri()
+        jobs.append((report_uri, f"silent_video_{index}.webm", audio_dir, output_file))
+
+    if not jobs:
+        return
 
     # --- Execute workflow ---
-    if not os.path.exists(temp_video_dir):
-        os.makedirs(temp_video_dir)
-
-    # 1. Record silent video and get the exact setup time to trim
-    trim_duration = asyncio.run(record_smart_report_tour(
-        report_uri=report_uri,
-        temp_video_path=temp_video_path,
-        resolution={"width": 1920, "height": 1080},
-        headless=not args.headed
-    ))
-
-    # 2. Merge with audio, passing in the calculated trim duration
-    if os.path.exists(temp_video_path) and trim_duration is not None:
-        merge_audio_and_video(
-            temp_video_path=temp_video_path,
-            audio_dir=audio_dir,
-            num_audio_clips=10,  # As defined in the report's tourData
-            final_output_path=args.output_file,
-            trim_start_seconds=trim_duration
-        )
+    # The recordings live in a private temporary directory that is removed with
+    # everything left in it once the batch is done
+    with tempfile.TemporaryDirectory(prefix='tour_', dir=temp_video_dir) as recording_dir:
+        # 1. Record each silent video and get the exact setup time to trim from it
+        # 2. Merge it with its audio while the next report is being recorded
+        asyncio.run(record_and_merge_tours(
+            jobs=[(report_uri, os.path.join(recording_dir, temp_video_name), audio_dir, output_file)
+                  for report_uri, temp_video_name, audio_dir, output_file in jobs],
+            resolution=resolution or DEFAULT_RESOLUTION,
+            headless=headless,
+            hwaccel=hwaccel,
+            preset=preset,
+            crf=crf,
+            sandbox=sandbox
+        ))
 
 
 if __name__ == "__main__":